@@ -1,11 +1,20 @@
+import functools
+import http.client
+import json
+import os
+import re
 import sys
+import threading
+import time
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from importlib import resources
 from pathlib import Path
-from typing import Iterator, Union, Optional
+from typing import Iterator, Optional
 
-from llama_cpp import Llama, LlamaTokenizer
+import orjson
+from llama_cpp import Llama, LlamaGrammar, LlamaState, GGML_TYPE_Q4_0, GGML_TYPE_Q8_0
 from llama_cpp.llama_types import CreateCompletionResponse
 from rich.progress import Progress, BarColumn, TextColumn, DownloadColumn, TransferSpeedColumn
 
@@ -38,8 +47,24 @@ MODEL_FILE = "Qwen3-30B-A3B-Instruct-2507-Q3_K_M.gguf"
 MODEL_DOWNLOAD_URL = f"https://huggingface.co/{MODEL_REPO}/resolve/main/{MODEL_FILE}"
 
 MODEL_MAX_TOKENS = 262144
+MIN_CONTEXT_SIZE = 2048
+OUTPUT_TOKEN_BUFFER = 4096
+# Quantization of the KV cache. Q8_0 halves its size compared to F16 without noticeable quality loss,
+# GGML_TYPE_Q4_0 can be used to quarter it for very large diffs.
+KV_CACHE_TYPE = GGML_TYPE_Q8_0
+# Both store blocks of 32 values with an f16 scale, as 32 int8 values or 16 bytes of int4 values
+KV_CACHE_BYTES_PER_ELEMENT = {GGML_TYPE_Q8_0: 34 / 32, GGML_TYPE_Q4_0: 18 / 32}[KV_CACHE_TYPE]
+MAX_BATCH_SIZE = 4096
+MICRO_BATCH_SIZE = 512
+# Fraction of the free VRAM that may be used for offloaded layers and the KV cache, the rest is left for buffers
+GPU_MEMORY_FRACTION = 0.9
 MODELS_DIR = Path.home() / ".preflight" / "models"
 MODEL_PATH = MODELS_DIR / MODEL_FILE
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_CONNECTIONS = 8
+# Interrupted ranges are resumed from where they stopped, with exponential backoff between attempts
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_TIMEOUT = 60
 
 # Load the system prompt from the packaged data file
 try:
@@ -48,14 +73,29 @@ except (FileNotFoundError, ModuleNotFoundError):
     print("FATAL: Could not find system_prompt.txt within the preflight package.", file=sys.stderr)
     sys.exit(1)
 
-
-@dataclass
+SYSTEM_PROMPT_PREFIX = (
+    f"<|im_start|>system\n"
+    f"{SYSTEM_PROMPT}<|im_end|>\n"
+)
+PROMPT_HEAD = (
+    f"{SYSTEM_PROMPT_PREFIX}"
+    f"<|im_start|>user\n"
+    f"Analyze the following git diff:\n"
+    f"    <diff>\n"
+).encode('utf-8')
+PROMPT_TAIL = (
+    "\n</diff><|im_end|>\n"
+    "<|im_start|>assistant"
+).encode('utf-8')
+
+
+@dataclass(slots=True)
 class LineRange:
     start: int
     end: int
 
 
-@dataclass
+@dataclass(slots=True)
 class ReviewIssue:
     file: str
     line: LineRange
@@ -67,119 +107,418 @@ class ReviewIssue:
     @classmethod
     def from_dict(cls, data: dict) -> 'ReviewIssue':
         data["line"] = LineRange(**data["line"])
+        # Interned so the severity lookups for colors hit the same string object every time
+        data["severity"] = sys.intern(data["severity"].upper())
         return cls(**data)
 
 
+# JSON schema of the model output, mirrors ReviewIssue. Used to constrain generation to valid JSON.
+REVIEW_ISSUES_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "file": {"type": "string"},
+            "line": {
+                "type": "object",
+                "properties": {
+                    "start": {"type": "integer"},
+                    "end": {"type": "integer"},
+                },
+                "required": ["start", "end"],
+            },
+            "severity": {"type": "string", "enum": ["CRITICAL", "HIGH", "MEDIUM"]},
+            "description": {"type": "string"},
+            "suggestion": {"type": "string"},
+            "codeSnippet": {"type": "string"},
+        },
+        "required": ["file", "line", "severity", "description", "suggestion"],
+    },
+}
+
+
+# Characters that change the state of IncrementalIssueExtractor outside and inside of JSON strings
+_OBJECT_CHARS_RE = re.compile(r'[{}"]')
+_STRING_CHARS_RE = re.compile(r'["\\]')
+
+
+class IncrementalIssueExtractor:
+    """Parses review issues out of the streamed model output as soon as each object is complete.
+
+    The output is scanned in a single pass and only the object currently being streamed is kept
+    in memory. Braces inside JSON strings are not counted.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._parts: list[str] = []
+        # Objects that were skipped because they are not valid issues
+        self.dropped: list[str] = []
+
+    def feed(self, text: str) -> list[ReviewIssue]:
+        """Consumes a chunk of output and returns the issues that were completed by it.
+
+        Objects that are not valid issues are skipped and collected in `dropped`.
+        """
+        issues = []
+        for issue_json in self._scan(text):
+            try:
+                issues.append(ReviewIssue.from_dict(orjson.loads(issue_json)))
+            except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+                self.dropped.append(issue_json)
+        return issues
+
+    def _scan(self, text: str) -> list[str]:
+        """Returns the JSON text of the top level objects completed by the chunk.
+
+        Instead of looping over every character in Python, the regexes jump straight to the next
+        character that can change the state.
+        """
+        objects = []
+        start = 0
+        pos = 0
+        if self._escaped and text:
+            # The previous chunk ended with a backslash, the first character is escaped
+            self._escaped = False
+            pos = 1
+
+        while True:
+            if self._in_string:
+                match = _STRING_CHARS_RE.search(text, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == '"':
+                    self._in_string = False
+                elif pos == len(text):
+                    self._escaped = True
+                    break
+                else:
+                    pos += 1
+                continue
+
+            match = _OBJECT_CHARS_RE.search(text, pos)
+            if match is None:
+                break
+            index = match.start()
+            pos = index + 1
+            char = match.group()
+            if char == '"':
+                self._in_string = self._depth > 0
+            elif char == '{':
+                if self._depth == 0:
+                    start = index
+                self._depth += 1
+            elif self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(text[start:pos])
+                    objects.append("".join(self._parts))
+                    self._parts.clear()
+
+        if self._depth > 0:
+            self._parts.append(text[start:])
+        return objects
+
+
 # --- Model Management ---
 def _download_model():
-    """Downloads the model file with a progress bar."""
+    """Downloads the model file with a progress bar.
+
+    If the server supports range requests the file is fetched over several parallel connections,
+    otherwise it falls back to a single stream.
+    """
     print(f"Model not found. Downloading from {MODEL_DOWNLOAD_URL} to {MODEL_PATH}...", file=sys.stderr)
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
+    # Downloaded under a temporary name, so an interrupted download is never mistaken for the model
+    partial_path = MODEL_PATH.with_suffix(MODEL_PATH.suffix + ".part")
 
     try:
-        with urllib.request.urlopen(MODEL_DOWNLOAD_URL) as response:
+        head_request = urllib.request.Request(MODEL_DOWNLOAD_URL, method="HEAD")
+        with urllib.request.urlopen(head_request) as response:
             total_size = int(response.headers.get('content-length', 0))
-            with Progress(
-                    TextColumn("[bold blue]{task.fields[filename]}", justify="right"),
-                    BarColumn(bar_width=None),
-                    "[progress.percentage]{task.percentage:>3.1f}%",
-                    "•",
-                    DownloadColumn(),
-                    "•",
-                    TransferSpeedColumn(),
-            ) as progress:
-                task = progress.add_task("Downloading", total=total_size, filename=MODEL_FILE)
-                with open(MODEL_PATH, 'wb') as f:
-                    while chunk := response.read(1024):
-                        f.write(chunk)
-                        progress.update(task, advance=len(chunk))
+            accepts_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+
+        with Progress(
+                TextColumn("[bold blue]{task.fields[filename]}", justify="right"),
+                BarColumn(bar_width=None),
+                "[progress.percentage]{task.percentage:>3.1f}%",
+                "•",
+                DownloadColumn(),
+                "•",
+                TransferSpeedColumn(),
+        ) as progress:
+            task = progress.add_task("Downloading", total=total_size, filename=MODEL_FILE)
+            with open(partial_path, 'wb') as f:
+                if accepts_ranges and total_size > 0:
+                    _download_ranges(f.fileno(), total_size, progress, task)
+                else:
+                    _download_stream(f, progress, task)
+        os.replace(partial_path, MODEL_PATH)
         print(f"Model downloaded successfully to {MODEL_PATH}", file=sys.stderr)
-    except Exception as e:
-        print(f"Failed to download model: {e}", file=sys.stderr)
-        if MODEL_PATH.exists():
-            MODEL_PATH.unlink()  # Clean up partial download
+    except BaseException as e:
+        print(f"Failed to download model: {e!r}", file=sys.stderr)
+        partial_path.unlink(missing_ok=True)  # Clean up partial download
         raise
 
 
-def calculate_tokens(content: str) -> int:
-    # This way of counting tokens can probably be optimized a lot so we don't have to load the model
-    llama = Llama(model_path=str(MODEL_PATH), n_ctx=1, n_gpu_layers=-1, verbose=False)
-    input_tokens = LlamaTokenizer(llama).tokenize(content.encode('utf-8'))
-    buffer_for_output = 4096
-    return len(input_tokens) + buffer_for_output
+def _download_stream(f, progress: Progress, task) -> None:
+    with urllib.request.urlopen(MODEL_DOWNLOAD_URL) as response:
+        while chunk := response.read(DOWNLOAD_CHUNK_SIZE):
+            f.write(chunk)
+            progress.update(task, advance=len(chunk))
+
+
+def _download_ranges(fd: int, total_size: int, progress: Progress, task) -> None:
+    """Splits the download into one byte range per connection and writes each range at its offset."""
+    os.ftruncate(fd, total_size)
+    range_size = -(-total_size // DOWNLOAD_CONNECTIONS)
+    ranges = [(start, min(start + range_size, total_size) - 1) for start in range(0, total_size, range_size)]
+    failed = threading.Event()
+
+    def download_range(start: int, end: int) -> None:
+        offset = start
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            if attempt > 0:
+                time.sleep(2 ** (attempt - 1))
+            try:
+                # Resumes from the last written byte if a previous attempt was interrupted
+                request = urllib.request.Request(MODEL_DOWNLOAD_URL, headers={"Range": f"bytes={offset}-{end}"})
+                with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+                    if response.status != 206:
+                        raise AiModelError(f"Server ignored range request, got HTTP {response.status}")
+                    while not failed.is_set() and (chunk := response.read(DOWNLOAD_CHUNK_SIZE)):
+                        os.pwrite(fd, chunk, offset)
+                        offset += len(chunk)
+                        progress.update(task, advance=len(chunk))
+            except (OSError, http.client.HTTPException):
+                if attempt == DOWNLOAD_RETRIES or failed.is_set():
+                    raise
+            if offset == end + 1 or failed.is_set():
+                return
+        raise AiModelError(f"Incomplete download of bytes {start}-{end}")
+
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_CONNECTIONS) as executor:
+        futures = [executor.submit(download_range, start, end) for start, end in ranges]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # Also on KeyboardInterrupt, the executor waits for the workers before the error propagates
+            failed.set()
+            raise
+
 
+# Held while loading so analyze_diff waits for a running preload instead of loading twice
+_preload_lock = threading.Lock()
 
-def get_model(content: str) -> Llama:
-    """Ensures the model is available and returns a Llama instance."""
+
+@functools.lru_cache(maxsize=1)
+def _get_tokenizer() -> Llama:
+    """Loads only the vocabulary of the model, which is all that is needed for tokenizing."""
     if not MODEL_PATH.exists():
         _download_model()
+    return Llama(model_path=str(MODEL_PATH), vocab_only=True, verbose=False)
+
+
+def preload_model():
+    """Prepares everything the review needs that does not depend on the diff.
 
-    num_of_tokens = calculate_tokens(content)
+    Meant to run in a background thread while the diff is collected. Downloading is left to
+    analyze_diff, so a download is never cut short by the process exiting early, and failures
+    are left for analyze_diff to report when it runs into them again.
+    """
+    if not MODEL_PATH.exists():
+        return
+    with _preload_lock:
+        try:
+            _get_tokenizer()
+            _get_review_grammar()
+        except Exception:
+            pass
+
+
+def tokenize(content: bytes) -> list[int]:
+    return _get_tokenizer().tokenize(content, special=True)
+
+
+def get_model(num_of_prompt_tokens: int) -> Llama:
+    """Returns a Llama instance with a context window large enough for the prompt and the response."""
+    num_of_tokens = num_of_prompt_tokens + OUTPUT_TOKEN_BUFFER
     print(f"Calculated tokens to: {num_of_tokens}")
 
     if num_of_tokens > MODEL_MAX_TOKENS:
         raise AiModelError(f"Input too large for model context window of {MODEL_MAX_TOKENS} tokens.")
 
-    return Llama(model_path=str(MODEL_PATH), n_ctx=num_of_tokens, n_gpu_layers=-1, verbose=False)
+    model = _load_model(get_context_size(num_of_tokens))
+    # Start from the cached system prompt so only the diff itself needs to be evaluated
+    model.load_state(_get_system_prompt_state(model))
+    return model
+
+
+@functools.lru_cache(maxsize=1)
+def _load_model(n_ctx: int) -> Llama:
+    """Loads the model once per context size and keeps it for the lifetime of the process.
+
+    Only one instance is kept since every instance holds its own copy of the offloaded weights.
+    """
+    cpu_count = os.cpu_count() or 1
+    return Llama(
+        model_path=str(MODEL_PATH),
+        n_ctx=n_ctx,
+        n_batch=min(n_ctx, MAX_BATCH_SIZE),
+        n_ubatch=MICRO_BATCH_SIZE,
+        # Generation runs best on the physical cores, prompt processing can use all of them
+        n_threads=max(cpu_count // 2, 1),
+        n_threads_batch=cpu_count,
+        n_gpu_layers=_get_gpu_layers(n_ctx),
+        offload_kqv=True,
+        use_mmap=True,
+        use_mlock=False,
+        type_k=KV_CACHE_TYPE,
+        type_v=KV_CACHE_TYPE,
+        # A quantized V cache is only supported together with flash attention
+        flash_attn=True,
+        verbose=False,
+    )
+
 
+def _estimate_kv_cache_size(metadata: dict[str, str], n_ctx: int) -> int:
+    """Estimates the size in bytes of the KV cache for a context of n_ctx tokens."""
+    arch = metadata.get("general.architecture")
+    n_layers = int(metadata.get(f"{arch}.block_count", 0))
+    n_head = int(metadata.get(f"{arch}.attention.head_count", 1))
+    n_head_kv = int(metadata.get(f"{arch}.attention.head_count_kv", n_head))
+    head_dim = int(metadata.get(f"{arch}.embedding_length", 0)) // n_head
+    key_length = int(metadata.get(f"{arch}.attention.key_length", head_dim))
+    value_length = int(metadata.get(f"{arch}.attention.value_length", head_dim))
+    return int(n_ctx * n_layers * n_head_kv * (key_length + value_length) * KV_CACHE_BYTES_PER_ELEMENT)
 
-def analyze_diff(diff_content: str, mock: bool = False) -> Union[
-    CreateCompletionResponse, Iterator[CreateCompletionResponse]]:
+
+def _pick_gpu_layers(free_vram: int, n_layers: int, model_size: int, kv_cache_size: int) -> int:
+    """Returns how many of n_layers fit in free_vram, -1 meaning all of them.
+
+    Every offloaded layer brings its share of the KV cache along, so both are divided over the layers.
+    """
+    bytes_per_layer = (model_size + kv_cache_size) / n_layers
+    gpu_layers = int(free_vram * GPU_MEMORY_FRACTION / bytes_per_layer)
+    return -1 if gpu_layers >= n_layers else gpu_layers
+
+
+@functools.lru_cache(maxsize=1)
+def _get_gpu_layers(n_ctx: int) -> int:
+    """Returns how many layers to offload to the GPU for a context of n_ctx tokens, -1 meaning all of them.
+
+    The PREFLIGHT_NGL environment variable overrides the value. On NVIDIA GPUs the number of layers
+    is derived from the free VRAM (requires the `gpu` extra), so a model that does not fit is partially
+    offloaded instead of silently ending up on the CPU. Everywhere else all layers are offloaded.
+    """
+    if (override := os.environ.get("PREFLIGHT_NGL")) is not None:
+        return int(override)
+
+    try:
+        import pynvml
+    except ImportError:
+        return -1
+
+    try:
+        pynvml.nvmlInit()
+        try:
+            free_vram = pynvml.nvmlDeviceGetMemoryInfo(pynvml.nvmlDeviceGetHandleByIndex(0)).free
+        finally:
+            pynvml.nvmlShutdown()
+    except pynvml.NVMLError:
+        return -1
+
+    metadata = _get_tokenizer().metadata
+    n_layers = int(metadata.get(f"{metadata.get('general.architecture')}.block_count", 0))
+    if n_layers == 0:
+        return -1
+
+    return _pick_gpu_layers(
+        free_vram, n_layers, MODEL_PATH.stat().st_size, _estimate_kv_cache_size(metadata, n_ctx)
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_system_prompt_state(model: Llama) -> LlamaState:
+    """Evaluates the static system prompt once and snapshots the resulting KV cache."""
+    model.reset()
+    model.eval(tokenize(SYSTEM_PROMPT_PREFIX.encode('utf-8')))
+    return model.save_state()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_review_grammar() -> LlamaGrammar:
+    """Compiles the output schema into a grammar once, it does not change between reviews."""
+    return LlamaGrammar.from_json_schema(json.dumps(REVIEW_ISSUES_SCHEMA), verbose=False)
+
+
+def get_context_size(num_of_tokens: int) -> int:
+    """Rounds the token count up to the next power of two, capped at the model's context window.
+
+    The KV cache grows linearly with the context size, so keeping it close to the actual
+    need leaves more memory for offloading layers to the GPU.
+    """
+    n_ctx = 1 << (max(num_of_tokens, MIN_CONTEXT_SIZE) - 1).bit_length()
+    return min(n_ctx, MODEL_MAX_TOKENS)
+
+
+def analyze_diff(diff_content: bytes, mock: bool = False) -> Iterator[CreateCompletionResponse]:
     """Analyzes a git diff using the AI model and streams the response.
 
+    The model is downloaded and loaded before this returns, on the calling thread, so an interrupt
+    stops it right away. Only the generation itself runs when the returned iterator is consumed.
+
     Returns:
-        A generator that yields response chunks.
+        An iterator that yields response chunks.
     """
     if mock:
         try:
             mock_response = Path("test-response.txt").read_text(encoding="utf-8")
-            # Return a single chunk simulating the full response
-            yield {
-                "id": "mock-id",
-                "object": "text_completion",
-                "created": 1234567890,
-                "model": "mock-model",
-                "choices": [
-                    {
-                        "text": mock_response,
-                        "index": 0,
-                        "logprobs": None,
-                        "finish_reason": "stop"
-                    }
-                ]
-            }
-            return
         except FileNotFoundError:
             raise AiModelError("test-response.txt not found for mock mode.")
-
-    prompt = get_prompt(diff_content)
-    model = get_model(prompt)
-
+        # Return a single chunk simulating the full response
+        return iter([{
+            "id": "mock-id",
+            "object": "text_completion",
+            "created": 1234567890,
+            "model": "mock-model",
+            "choices": [
+                {
+                    "text": mock_response,
+                    "index": 0,
+                    "logprobs": None,
+                    "finish_reason": "stop"
+                }
+            ]
+        }])
+
+    # Tokenized up front so the tokens can be used both for sizing the context and as the prompt
+    with _preload_lock:
+        prompt_tokens = tokenize(get_prompt(diff_content))
+        model = get_model(len(prompt_tokens))
+        grammar = _get_review_grammar()
+
+    # Streaming completions are generators, nothing is evaluated until the first chunk is requested
     return model(
-        prompt,
+        prompt_tokens,
         max_tokens=0,
         temperature=0.7,
         min_p=0.00,
         top_k=20,
         top_p=0.8,
         repeat_penalty=1.05,
+        grammar=grammar,
         stream=True,
     )
 
 
-def get_prompt(diff_content: str) -> str:
-    user_prompt = f"""Analyze the following git diff:
-    <diff>
-{diff_content}
-</diff>"""
-    prompt = (
-        f"<|im_start|>system\n"
-        f"{SYSTEM_PROMPT}<|im_end|>\n"
-        f"<|im_start|>user\n"
-        f"{user_prompt}<|im_end|>\n"
-        f"<|im_start|>assistant"
-    )
-    return prompt
+def get_prompt(diff_content: bytes) -> bytes:
+    """Builds the prompt as bytes, so the diff never has to be decoded or copied into a str."""
+    return b"".join((PROMPT_HEAD, diff_content, PROMPT_TAIL))
 
 
 class AiModelError(Exception):
@@ -1,18 +1,44 @@
 import sqlite3
+import time
 from pathlib import Path
-from datetime import datetime
 from preflight.ai_reviewer import ReviewIssue
 
+# Bump when the schema changes and add the migration to _create_tables
+SCHEMA_VERSION = 2
+
+
 class Database:
     def __init__(self, db_path: Path = Path.home() / ".preflight" / "reviews.db"):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
         self._create_tables()
 
     def _create_tables(self):
         cursor = self.conn.cursor()
-        
+
+        # The schema is up to date, skip all DDL
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        if version < 1:
+            self._migrate_to_v1(cursor)
+
+        if version < 2:
+            # created_at is stored as unix epoch seconds instead of a local ISO timestamp string
+            cursor.execute("""
+                UPDATE issues SET created_at = CAST(strftime('%s', created_at, 'utc') AS INTEGER)
+                WHERE typeof(created_at) = 'text'
+            """)
+
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    def _migrate_to_v1(self, cursor: sqlite3.Cursor):
         # Create table with new schema if it doesn't exist
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS issues (
@@ -27,7 +53,7 @@ class Database:
                 commit_hash TEXT,
                 branch TEXT,
                 project TEXT,
-                created_at TIMESTAMP
+                created_at INTEGER
             )
         """)
         
@@ -42,29 +68,34 @@ class Database:
 
         if "project" not in columns:
             cursor.execute("ALTER TABLE issues ADD COLUMN project TEXT")
-            
-        self.conn.commit()
 
     def save_issue(self, issue: ReviewIssue, commit_hash: str, branch: str, project: str):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO issues (
-                file, start_line, end_line, severity, description, suggestion, code_snippet, commit_hash, branch, project, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            issue.file,
-            issue.line.start,
-            issue.line.end,
-            issue.severity,
-            issue.description,
-            issue.suggestion,
-            issue.codeSnippet,
-            commit_hash,
-            branch,
-            project,
-            datetime.now()
-        ))
-        self.conn.commit()
+        self.save_issues([issue], commit_hash, branch, project)
+
+    def save_issues(self, issues: list[ReviewIssue], commit_hash: str, branch: str, project: str):
+        """Saves all issues in a single transaction, none are saved if any insert fails."""
+        created_at = int(time.time())
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO issues (
+                    file, start_line, end_line, severity, description, suggestion, code_snippet, commit_hash, branch, project, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    issue.file,
+                    issue.line.start,
+                    issue.line.end,
+                    issue.severity,
+                    issue.description,
+                    issue.suggestion,
+                    issue.codeSnippet,
+                    commit_hash,
+                    branch,
+                    project,
+                    created_at
+                )
+                for issue in issues
+            ])
 
     def close(self):
         self.conn.close()
@@ -1,11 +1,16 @@
-def get_color(severity):
-    """Returns a color string based on severity level."""
-    return {
-        "CRITICAL": "bold red",
-        "HIGH": "red",
-        "MEDIUM": "yellow",
-        "LOW": "cyan",
-        "INFO": "blue"
-    }.get(severity.upper(), "default")
+from rich.style import Style
 
+# Parsed once, so Rich does not have to parse the style strings on every render
+_SEVERITY_STYLES = {
+    "CRITICAL": Style.parse("bold red"),
+    "HIGH": Style.parse("red"),
+    "MEDIUM": Style.parse("yellow"),
+    "LOW": Style.parse("cyan"),
+    "INFO": Style.parse("blue"),
+}
+_DEFAULT_STYLE = Style.parse("default")
 
+
+def get_color(severity) -> Style:
+    """Returns a color style based on severity level."""
+    return _SEVERITY_STYLES.get(severity.upper(), _DEFAULT_STYLE)
@@ -35,6 +35,24 @@ def get_current_commit_hash() -> str:
         print(f"Error getting current commit hash: {e.stderr}", file=sys.stderr)
         raise
 
+def get_current_commit_info() -> tuple[str, str, str]:
+    """Gets the current git commit hash, branch name and repo root with a single git invocation."""
+    try:
+        process = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel", "HEAD", "--abbrev-ref", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        repo_root, commit_hash, branch = process.stdout.splitlines()
+        return commit_hash, branch, repo_root
+    except FileNotFoundError:
+        print("Error: 'git' command not found. Is Git installed and in your PATH?", file=sys.stderr)
+        raise
+    except subprocess.CalledProcessError as e:
+        print(f"Error getting current commit info: {e.stderr}", file=sys.stderr)
+        raise
+
 def get_repo_root() -> str:
     """Gets the absolute path to the root of the git repository."""
     try:
@@ -52,13 +70,12 @@ def get_repo_root() -> str:
         print(f"Error getting repo root: {e.stderr}", file=sys.stderr)
         raise
 
-def get_current_git_diff() -> str:
+def get_current_git_diff() -> bytes:
     """Gets the current Git diff (unstaged and staged changes)."""
     try:
         process = subprocess.run(
             ["git", "diff"],
             capture_output=True,
-            text=True,
             check=True
         )
         return process.stdout
@@ -66,16 +83,15 @@ def get_current_git_diff() -> str:
         print("Error: 'git' command not found. Is Git installed and in your PATH?", file=sys.stderr)
         raise
     except subprocess.CalledProcessError as e:
-        print(f"Error getting current git diff: {e.stderr}", file=sys.stderr)
+        print(f"Error getting current git diff: {e.stderr.decode(errors='replace')}", file=sys.stderr)
         raise
 
-def get_last_commit_changes() -> str:
+def get_last_commit_changes() -> bytes:
     """Gets the diff and metadata for the last git commit (HEAD)."""
     try:
         process = subprocess.run(
             ["git", "show", "HEAD"],
             capture_output=True,
-            text=True,
             check=True
         )
         return process.stdout
@@ -84,10 +100,10 @@ def get_last_commit_changes() -> str:
         raise
     except subprocess.CalledProcessError as e:
         print("Error getting last commit changes:", file=sys.stderr)
-        print(e.stderr, file=sys.stderr)
+        print(e.stderr.decode(errors='replace'), file=sys.stderr)
         raise
 
-def get_git_diff(branch_name: str, base_branch: str = "master") -> str:
+def get_git_diff(branch_name: str, base_branch: str = "master") -> bytes:
     """Gets the git diff between the specified branch and a base branch.
 
     Args:
@@ -95,14 +111,13 @@ def get_git_diff(branch_name: str, base_branch: str = "master") -> str:
         base_branch: The base branch to compare against (defaults to "master").
 
     Returns:
-        The git diff as a string.
+        The git diff as raw bytes.
     """
     try:
         command = ["git", "diff", base_branch, branch_name]
         process = subprocess.run(
             command,
             capture_output=True,
-            text=True,
             check=True
         )
         return process.stdout
@@ -111,5 +126,5 @@ def get_git_diff(branch_name: str, base_branch: str = "master") -> str:
         raise
     except subprocess.CalledProcessError as e:
         print(f"Error getting git diff for branch '{branch_name}':", file=sys.stderr)
-        print(e.stderr, file=sys.stderr)
+        print(e.stderr.decode(errors='replace'), file=sys.stderr)
         raise
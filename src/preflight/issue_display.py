@@ -1,7 +1,11 @@
+import os
+import re
+import select
 import sys
 import termios
 import tty
 from rich.console import Console, Group
+from rich.live import Live
 from rich.panel import Panel
 from rich.text import Text
 from dataclasses import dataclass
@@ -9,69 +13,107 @@ from dataclasses import dataclass
 from preflight.ai_reviewer import ReviewIssue  # Import necessary classes
 from preflight.display_utils import get_color
 
-def getch():
-    """Reads a single character from stdin without echoing or requiring Enter."""
-    fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
-    try:
-        tty.setraw(sys.stdin.fileno())
-        ch = sys.stdin.read(1)
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return ch
-
-
-@dataclass
+# Keys are read in cbreak mode, a read returns as soon as one byte is available. An escape
+# sequence usually arrives in a single read, when a read ends partway through one the rest is
+# awaited for up to ESCAPE_SEQUENCE_TIMEOUT before what arrived is treated as ESC.
+KEY_READ_SIZE = 8
+ESCAPE_SEQUENCE_TIMEOUT = 0.05
+NEXT_KEYS = {b'\x1b[B', b'\x1bOB', b'j', b'J'}
+PREVIOUS_KEYS = {b'\x1b[A', b'\x1bOA', b'k', b'K'}
+# A CSI or SS3 sequence (ESC, '[' or 'O', parameter bytes and a final byte), a bare ESC or any other byte.
+# A sequence cut off before its final byte is matched as well so it can be completed.
+_KEY_RE = re.compile(rb'\x1b[\[O][\x20-\x3f]*[\x40-\x7e]?|.', re.DOTALL)
+HELP_TEXT = Text("Press 'j' or down arrow for next, 'k' or up arrow for previous, 'Esc' to quit...", style="yellow")
+
+
+def _enter_key_mode(fd: int):
+    """Disables line buffering and echo while keeping output processing and signals intact."""
+    tty.setcbreak(fd)
+    attributes = termios.tcgetattr(fd)
+    attributes[tty.CC][termios.VMIN] = 1
+    attributes[tty.CC][termios.VTIME] = 0
+    termios.tcsetattr(fd, termios.TCSADRAIN, attributes)
+
+
+def _is_unterminated(key: bytes) -> bool:
+    """Whether the key is an ESC or an escape sequence still missing its final byte."""
+    return key.startswith(b'\x1b') and not (len(key) >= 3 and 0x40 <= key[-1] <= 0x7e)
+
+
+def _read_keys(fd: int, data: bytes) -> list[bytes]:
+    """Splits a read into keys, completing an escape sequence that was cut off at its end.
+
+    The rest of the sequence is awaited for up to ESCAPE_SEQUENCE_TIMEOUT, after which what was
+    received is kept as is. Bytes read past the end of the sequence are split into keys of their own.
+    """
+    keys = _split_keys(data)
+    while keys and _is_unterminated(keys[-1]):
+        ready, _, _ = select.select([fd], [], [], ESCAPE_SEQUENCE_TIMEOUT)
+        if not ready:
+            break
+        more = os.read(fd, KEY_READ_SIZE)
+        if not more:
+            break
+        keys[-1:] = _split_keys(keys[-1] + more)
+    return keys
+
+
+def _split_keys(data: bytes) -> list[bytes]:
+    """Splits a read into keys, a read can hold several when keys repeat or arrive together."""
+    return _KEY_RE.findall(data)
+
+
+@dataclass(slots=True)
 class DisplayIssue:
     issue: ReviewIssue
+    panel: Panel
     watched: bool = False
 
 
+def _render_issue(issue: ReviewIssue) -> Panel:
+    """Builds the panel of an issue, done once since only its title changes while navigating."""
+    severity_style = get_color(issue.severity)
+
+    main_text = Text()
+    main_text.append("Severity: ", style="bold magenta")
+    main_text.append(issue.severity, style=severity_style)
+    main_text.append(f"\nFile: {issue.file}", style="bold")
+    main_text.append(f"\nLine: {issue.line.start}-{issue.line.end}")
+    main_text.append("\n\nDescription: ", style="bold magenta")
+    main_text.append(issue.description)
+    main_text.append("\n\nSuggestion: ", style="bold magenta")
+    main_text.append(issue.suggestion)
+
+    renderables = [main_text]
+
+    if issue.codeSnippet:
+        renderables.append(Text("\nCode Snippet:", style="bold magenta"))
+        renderables.append(Text(issue.codeSnippet, style="green"))
+
+    return Panel(Group(*renderables), border_style="green")
+
+
 class IssueDisplay:
     def __init__(self, console: Console):
         self.console = console
         self.issues: list[DisplayIssue] = []
+        self.unwatched_count = 0
 
     def add_issue(self, issue: ReviewIssue):
-        self.issues.append(DisplayIssue(issue=issue, watched=False))
-
-    def update_display(self):
-        """Updates the display with the current issue."""
-        if not self.issues:
-            self.console.print("No issues to display yet.", style="yellow")
-            return
+        self.issues.append(DisplayIssue(issue=issue, panel=_render_issue(issue), watched=False))
+        self.unwatched_count += 1
 
-        self.console.clear()
+    def update_display(self, live: Live):
+        """Updates the live display with the current issue, only redrawing what changed."""
         display_issue = self.issues[self.current_issue_index]
-        display_issue.watched = True
-        issue = display_issue.issue
-
-        unwatched_count = sum(1 for di in self.issues if not di.watched)
-        unwatched_color = "green" if unwatched_count == 0 else "red"
-        title = f"Preflight Review Issue {self.current_issue_index + 1} of {len(self.issues)} ([{unwatched_color}]Unwatched: {unwatched_count}[/{unwatched_color}])"
-        
-        severity_style = get_color(issue.severity)
-
-        main_text = Text()
-        main_text.append("Severity: ", style="bold magenta")
-        main_text.append(issue.severity, style=severity_style)
-        main_text.append(f"\nFile: {issue.file}", style="bold")
-        main_text.append(f"\nLine: {issue.line.start}-{issue.line.end}")
-        main_text.append("\n\nDescription: ", style="bold magenta")
-        main_text.append(issue.description)
-        main_text.append("\n\nSuggestion: ", style="bold magenta")
-        main_text.append(issue.suggestion)
-
-        renderables = [main_text]
+        if not display_issue.watched:
+            display_issue.watched = True
+            self.unwatched_count -= 1
 
-        if issue.codeSnippet:
-            renderables.append(Text("\nCode Snippet:", style="bold magenta"))
-            renderables.append(Text(issue.codeSnippet, style="green"))
+        unwatched_color = "green" if self.unwatched_count == 0 else "red"
+        display_issue.panel.title = f"Preflight Review Issue {self.current_issue_index + 1} of {len(self.issues)} ([{unwatched_color}]Unwatched: {self.unwatched_count}[/{unwatched_color}])"
 
-        content_group = Group(*renderables)
-
-        self.console.print(Panel(content_group, title=title, border_style="green"))
-        self.console.print("Press 'j' or down arrow for next, 'k' or up arrow for previous, 'Esc' to quit...", style="yellow")
+        live.update(Group(display_issue.panel, HELP_TEXT), refresh=True)
 
     def display_issues(self):
         """Interactively displays a list of review issues in the console."""
@@ -82,36 +124,30 @@ class IssueDisplay:
         self.console.print(f"Found {len(self.issues)} issues. Starting review...", style="bold green")
         self.current_issue_index = 0
 
+        fd = sys.stdin.fileno()
+        old_settings = termios.tcgetattr(fd)
+        try:
+            _enter_key_mode(fd)
+            with Live(console=self.console, screen=True, auto_refresh=False) as live:
+                self._navigate(fd, live)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+
+    def _navigate(self, fd: int, live: Live):
         while True:
-            self.update_display()
-            # --- Handle User Input ---
+            self.update_display(live)
             try:
-                user_input = getch()
-
-                if user_input == '\x1b':  # ESC or arrow key
-                    # Try to read the next two characters for arrow keys
-                    # This is a common pattern for arrow keys in terminals
-                    next_char_1 = getch()
-                    if next_char_1 == '[':
-                        next_char_2 = getch()
-                        if next_char_2 == 'A':  # Up arrow
-                            self.current_issue_index = (self.current_issue_index - 1) % len(self.issues)
-                        elif next_char_2 == 'B':  # Down arrow
-                            self.current_issue_index = (self.current_issue_index + 1) % len(self.issues)
-                        else:
-                            # Unknown escape sequence, treat as ESC (quit)
-                            break
-                    else:
-                        # Just ESC
-                        break
-                elif user_input.lower() == 'j':
+                data = os.read(fd, KEY_READ_SIZE)
+            except KeyboardInterrupt:
+                return
+
+            if not data:  # EOF
+                return
+
+            for key in _read_keys(fd, data):
+                if key in NEXT_KEYS:
                     self.current_issue_index = (self.current_issue_index + 1) % len(self.issues)
-                elif user_input.lower() == 'k':
+                elif key in PREVIOUS_KEYS:
                     self.current_issue_index = (self.current_issue_index - 1) % len(self.issues)
-                elif user_input == '\x03': # Ctrl+C
-                    break
-                else:
-                    # Ignore other keys
-                    pass
-            except (KeyboardInterrupt, EOFError):
-                break
+                elif key.startswith(b'\x1b') or key == b'\x03':  # ESC, unknown escape sequence or Ctrl+C
+                    return
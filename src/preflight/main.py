@@ -1,24 +1,26 @@
-import json
+from __future__ import annotations
+
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from importlib import resources
-from typing import Iterator
+from typing import Iterator, TYPE_CHECKING
 from pathlib import Path
 
-import rich.status
 import typer
-from llama_cpp import CreateCompletionResponse
 from rich.console import Console
 
-from preflight.ai_reviewer import analyze_diff, ReviewIssue, AiModelError
 from preflight.display_utils import get_color
-from preflight.git_utils import get_git_diff, get_current_branch, get_current_git_diff, get_last_commit_changes, get_current_commit_hash, get_repo_root
-from preflight.issue_display import IssueDisplay
-from preflight.database import Database
+from preflight.git_utils import get_last_commit_changes, get_current_commit_info
 from preflight.notification import send_notification
-from preflight.report_generator import generate_mock_report
+
+if TYPE_CHECKING:
+    from llama_cpp import CreateCompletionResponse
+    from preflight.ai_reviewer import ReviewIssue
 
 app = typer.Typer()
 console = Console()
-issue_display = IssueDisplay(console)
 
 @app.callback(invoke_without_command=True)
 def review(
@@ -44,8 +46,16 @@ def review(
     )
 ):
     """Analyzes the files in a git branch for potential issues using a local AI model."""
+    # Imported here so that --help does not have to load llama_cpp
+    from preflight.ai_reviewer import analyze_diff, preload_model, AiModelError
+    from preflight.report_generator import generate_mock_report
+
     try:
-        diff_content, commit_hash, branch = get_text_to_review(base_branch, action, test)
+        # Loading does not depend on the diff, so it overlaps with running git
+        if not mock_ai:
+            threading.Thread(target=preload_model, daemon=True).start()
+
+        diff_content, commit_hash, branch, project_name = get_text_to_review(base_branch, action, test)
 
         if not diff_content.strip():
             console.print("No differences found. Nothing to review.", style="green")
@@ -61,63 +71,31 @@ def review(
             console.print(f":x: Critical Error: {e}", style="bold red")
             return
 
-        console.clear()
-
-        spinner = rich.status.Status("Analyzing code...", spinner="dots")
-
-        spinner.start()
-        full_response = process_model_output(result, spinner)
-        spinner.stop()
-
-        # 4. Parse the final response
-        console.print("Parsing final response...", style="yellow")
-
-        # Find the start and end of the JSON array
-        start_index = full_response.find('[')
-        end_index = full_response.rfind(']')
-
-        if start_index != -1 and end_index != -1 and end_index > start_index:
-            json_text = full_response[start_index: end_index + 1]
-            try:
-                issues_data = json.loads(json_text)
-                
-                # Initialize Database
-                db = Database()
-
-                # Get project name
-                if test:
-                    project_name = "test-project"
-                else:
-                    try:
-                        project_name = Path(get_repo_root()).name
-                    except Exception:
-                        project_name = "unknown-project"
-
-                review_issues = []
-                # Save issues to database
-                for item in issues_data:
-                    issue = ReviewIssue.from_dict(item)
-                    db.save_issue(issue, commit_hash, branch, project_name)
-                    review_issues.append(issue)
-
-                db.close()
-                console.print(f"✨ Analysis complete. Saved {len(review_issues)} issues to database.", style="bold green")
-                
-                # Generate report and notify
-                reports_root = Path.home() / ".preflight" / "reports"
-                report_path = reports_root / project_name / branch / f"{commit_hash}.html"
-                generate_mock_report(report_path, review_issues, commit_hash, branch, project_name, reports_root=reports_root)
-                
-                if len(review_issues) > 0:
-                    send_notification(f"Found {len(review_issues)} issues in review", f"file://{report_path}")
-
-            except json.JSONDecodeError as e:
-                console.print(f":x: Failed to parse JSON from AI response: {e}", style="bold red")
-                console.print(f"--- Extracted Text ---\n{json_text}", style="dim")
-                raise typer.Exit(code=1)
+        # The spinner and styled output are skipped when piped or running in CI
+        if console.is_terminal:
+            console.clear()
+            with console.status("Analyzing code...", spinner="dots"):
+                review_issues = process_model_output(iterate_in_background(result), verbose=mock_ai)
         else:
-            console.print(":warning: Could not find a JSON array in the model's output.", style="yellow")
-            console.print(f"--- Raw Response ---\n{full_response}", style="dim")
+            review_issues = process_model_output(iterate_in_background(result), verbose=mock_ai)
+
+        # An empty result is as likely to be unparsable output as a clean diff, so it is not reported as a pass
+        if not review_issues:
+            console.print(":warning: No issues were parsed from the model's output.", style="yellow")
+            return
+
+        # Save issues to database while the report is generated, neither depends on the other
+        reports_root = Path.home() / ".preflight" / "reports"
+        report_path = reports_root / project_name / branch / f"{commit_hash}.html"
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            saved = executor.submit(save_issues, review_issues, commit_hash, branch, project_name)
+            generate_mock_report(report_path, review_issues, commit_hash, branch, project_name, reports_root=reports_root)
+            saved.result()
+        console.print(f"✨ Analysis complete. Saved {len(review_issues)} issues to database.", style="bold green")
+
+        # Notify
+        if len(review_issues) > 0:
+            send_notification(f"Found {len(review_issues)} issues in review", f"file://{report_path}")
 
     except FileNotFoundError:
         console.print(":x: Critical Error: 'git' command not found. Is Git installed?", style="bold red")
@@ -128,58 +106,95 @@ def review(
         raise typer.Exit(code=1)
 
 
-def get_text_to_review(base_branch: str, action: str, test: bool) -> tuple[str, str, str]:
+@functools.lru_cache(maxsize=1)
+def _load_test_diff() -> bytes:
+    return resources.files('preflight').joinpath('test_diff.txt').read_bytes()
+
+
+def get_text_to_review(base_branch: str, action: str, test: bool) -> tuple[bytes, str, str, str]:
+    """Returns the diff to review together with the commit hash, branch and project name."""
     if test:
-        return resources.files('preflight').joinpath('test_diff.txt').read_text(encoding='utf-8'), "TEST_COMMIT_HASH", "TEST_BRANCH"
+        return _load_test_diff(), "TEST_COMMIT_HASH", "TEST_BRANCH", "test-project"
 
     if action == 'commit':
-        return get_last_commit_changes(), get_current_commit_hash(), get_current_branch()
+        commit_hash, branch, repo_root = get_current_commit_info()
+        return get_last_commit_changes(), commit_hash, branch, Path(repo_root).name
+
+    raise NotImplementedError("Only commits reviews are implemented")
+
 
-    raise NotImplemented("Only commits reviews are implemented")
+def save_issues(issues: list[ReviewIssue], commit_hash: str, branch: str, project: str):
+    """Saves the issues with a connection of its own, so it can run on any thread."""
+    from preflight.database import Database
+
+    db = Database()
+    try:
+        db.save_issues(issues, commit_hash, branch, project)
+    finally:
+        db.close()
 
-    # if type == 'diff':
-    #     console.print(":mag: Analyzing current Git diff...", style="yellow")
-    #     diff_content = get_current_git_diff()
-    # else:
-    #     console.print(f":mag: Analyzing diff for current branch '{branch}' against {base_branch}...",
-    #                   style="yellow")
-    #     diff_content = get_git_diff(branch, base_branch)
-    # return diff_content
 
+def iterate_in_background(result: Iterator[CreateCompletionResponse]) -> Iterator[CreateCompletionResponse]:
+    """Runs the model generation in a background thread and yields its chunks as they arrive.
 
-def process_model_output(result: CreateCompletionResponse | Iterator[CreateCompletionResponse],
-                         spinner: rich.status.Status) -> str:
-    full_response = ""
-    partial_response = ""
-    open_brackets = 0
+    This lets the output be parsed and printed while the model keeps decoding the next tokens.
+    """
+    chunks: queue.Queue = queue.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for chunk in result:
+                chunks.put(chunk)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    while (chunk := chunks.get()) is not done:
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
+
+
+def process_model_output(
+    result: CreateCompletionResponse | Iterator[CreateCompletionResponse], verbose: bool = False
+) -> list[ReviewIssue]:
+    """Prints the issues as they are streamed and returns them once the output is complete.
+
+    On a terminal the issues are printed above the running spinner, otherwise as plain tab
+    separated lines. Objects that are not valid issues are counted in a warning, and printed
+    as well when verbose.
+    """
+    from preflight.ai_reviewer import IncrementalIssueExtractor
+
+    issues = []
+    extractor = IncrementalIssueExtractor()
     for output in result:
         output_text = output['choices'][0]['text']
 
-        for output_char in output_text:
-            partial_response += output_char
-
-            open_brackets += output_char.count('{')
-            open_brackets -= output_char.count('}')
-
-            if open_brackets == 0 and len(partial_response) > 5:
-                start_index = partial_response.find('{')
-                end_index = partial_response.rfind('}')
-                try:
-                    # {'file': 'src/main/java/com/example/app/Greeter.java', 'line': {'start': 26, 'end': 26}, 'severity': 'MEDIUM', 'description': "The 'generateGreeting' method uses a new Random instance on each call, which is inefficient and unnecessary. This can
-                    # lead to poor performance if called frequently.", 'suggestion': 'Consider reusing a single Random instance as a class-level field or using a thread-safe alternative like ThreadLocalRandom.', 'codeSnippet': 'public String generateGreeting(String
-                    # name) {\n        if (new Random().nextBoolean()) {\n            return "Hello, " + name;\n        } else {\n            return "Howdy ho, " + name;\n        }\n    }'}
-                    issue_data = json.loads(partial_response[start_index: end_index + 1])
-                    color = get_color(issue_data['severity'])
-
-                    spinner.stop()
-                    console.print(f"\r:warning: Issue found in {issue_data['file']}\n{issue_data['description']}\n\n", style=color, end="")
-                    spinner.start()
-                    partial_response = partial_response[end_index + 1:]
-                except json.JSONDecodeError:
-                    pass
-
-        full_response += output['choices'][0]['text']
-    return full_response
+        # All issues completed by a chunk are printed together
+        if new_issues := extractor.feed(output_text):
+            issues.extend(new_issues)
+            if not console.is_terminal:
+                for issue in new_issues:
+                    print(f"{issue.severity}\t{issue.file}:{issue.line.start}\t{issue.description}")
+                continue
+
+            lines = [
+                console.render_str(f":warning: Issue found in {issue.file}\n{issue.description}\n\n", style=get_color(issue.severity))
+                for issue in new_issues
+            ]
+            console.print(*lines, sep="", end="")
+
+    if extractor.dropped:
+        console.print(f":warning: Skipped {len(extractor.dropped)} objects in the model's output that are not valid issues.", style="yellow")
+        if verbose:
+            for issue_json in extractor.dropped:
+                console.print(issue_json, style="dim", markup=False, highlight=False)
+    return issues
 
 
 if __name__ == "__main__":
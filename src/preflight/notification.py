@@ -1,22 +1,42 @@
+import shutil
 import subprocess
 import sys
 
+NOTIFICATION_TITLE = "Preflight Review"
+
+# Resolved once, the available notifier does not change while the CLI runs
+_TERMINAL_NOTIFIER = shutil.which("terminal-notifier")
+_OSASCRIPT = shutil.which("osascript")
+_NOTIFY_SEND = shutil.which("notify-send")
+
+
 def send_notification(message: str, open_url: str):
-    """Sends a system notification using terminal-notifier."""
-    try:
-        subprocess.run(
-            [
-                "terminal-notifier",
-                "-title", "Preflight Review",
-                "-message", message,
-                "-open", open_url
-            ],
-            check=True,
-            capture_output=True
-        )
-    except FileNotFoundError:
-        print("Warning: 'terminal-notifier' not found. Notification skipped.", file=sys.stderr)
+    """Sends a system notification.
+
+    Uses terminal-notifier when installed, since it is the only one that can open the report on
+    click. Otherwise falls back to osascript on macOS and notify-send on Linux, which include the
+    URL in the message instead.
+    """
+    if _TERMINAL_NOTIFIER:
+        command = [_TERMINAL_NOTIFIER, "-title", NOTIFICATION_TITLE, "-message", message, "-open", open_url]
+    elif _OSASCRIPT:
+        # The text is passed as arguments so it never has to be quoted inside the script
+        command = [
+            _OSASCRIPT,
+            "-e", "on run argv",
+            "-e", "display notification (item 1 of argv) with title (item 2 of argv)",
+            "-e", "end run",
+            f"{message}\n{open_url}", NOTIFICATION_TITLE,
+        ]
+    elif _NOTIFY_SEND:
+        command = [_NOTIFY_SEND, NOTIFICATION_TITLE, f"{message}\n{open_url}"]
+    else:
+        print("Warning: No notifier found (terminal-notifier, osascript or notify-send). Notification skipped.", file=sys.stderr)
         print(f"Message: {message}", file=sys.stderr)
         print(f"URL: {open_url}", file=sys.stderr)
+        return
+
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except subprocess.CalledProcessError as e:
         print(f"Error sending notification: {e}", file=sys.stderr)
@@ -0,0 +1,39 @@
+import sys
+from unittest.mock import MagicMock
+
+# Mocked once for the whole session, pytest loads this before any test module
+sys.modules["llama_cpp"] = MagicMock()
+sys.modules["llama_cpp.llama_types"] = MagicMock()
+
+import pytest
+from preflight.ai_reviewer import ReviewIssue, LineRange
+
+
+@pytest.fixture(scope="session")
+def sample_issues():
+    return [
+        ReviewIssue(
+            file="src/main.py",
+            line=LineRange(10, 15),
+            severity="HIGH",
+            description="This is a critical security vulnerability.",
+            suggestion="Use a safer function.",
+            codeSnippet="def malicious_code():\n    eval(user_input)"
+        ),
+        ReviewIssue(
+            file="src/utils.py",
+            line=LineRange(5, 5),
+            severity="MEDIUM",
+            description="This function is deprecated.",
+            suggestion="Use the new API.",
+            codeSnippet=None
+        ),
+        ReviewIssue(
+            file="README.md",
+            line=LineRange(1, 1),
+            severity="LOW",
+            description="Typo in documentation.",
+            suggestion="Fix typo.",
+            codeSnippet="# Preeflight"
+        )
+    ]
@@ -0,0 +1,49 @@
+import sqlite3
+from datetime import datetime
+
+from preflight.database import Database, SCHEMA_VERSION
+
+# The schema written before the database was versioned, with created_at as a local timestamp string
+V0_SCHEMA = """
+    CREATE TABLE issues (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file TEXT,
+        start_line INTEGER,
+        end_line INTEGER,
+        severity TEXT,
+        description TEXT,
+        suggestion TEXT,
+        code_snippet TEXT,
+        commit_hash TEXT,
+        branch TEXT,
+        project TEXT,
+        created_at TIMESTAMP
+    )
+"""
+
+def test_migrates_v0_timestamps_to_epoch_seconds(tmp_path, monkeypatch):
+    db_path = tmp_path / "reviews.db"
+    created_at = datetime(2025, 3, 14, 15, 9, 26, 535897)
+    conn = sqlite3.connect(db_path)
+    conn.execute(V0_SCHEMA)
+    conn.execute("INSERT INTO issues (file, created_at) VALUES (?, ?)", ("a.c", str(created_at)))
+    conn.commit()
+    conn.close()
+
+    db = Database(db_path)
+    row = db.conn.execute("SELECT typeof(created_at), created_at FROM issues").fetchone()
+    assert row == ("integer", int(created_at.timestamp()))
+    assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION == 2
+    db.close()
+
+    statements = []
+    sqlite_connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        conn = sqlite_connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr("preflight.database.sqlite3.connect", connect)
+    Database(db_path).close()
+    assert statements == ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL", "PRAGMA user_version"]
@@ -0,0 +1,20 @@
+from preflight.ai_reviewer import _estimate_kv_cache_size, _pick_gpu_layers
+
+GIB = 1 << 30
+
+def test_estimates_kv_cache_from_metadata():
+    metadata = {
+        "general.architecture": "qwen3moe",
+        "qwen3moe.block_count": "48",
+        "qwen3moe.attention.head_count": "32",
+        "qwen3moe.attention.head_count_kv": "4",
+        "qwen3moe.embedding_length": "2048",
+        "qwen3moe.attention.key_length": "128",
+        "qwen3moe.attention.value_length": "128",
+    }
+
+    assert _estimate_kv_cache_size(metadata, 32768) == int(32768 * 48 * 4 * 256 * 34 / 32)
+
+def test_kv_cache_reduces_offloaded_layers():
+    assert _pick_gpu_layers(20 * GIB, 48, 12 * GIB, 0) == -1
+    assert _pick_gpu_layers(20 * GIB, 48, 12 * GIB, 12 * GIB) == 36
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+from preflight.issue_display import _read_keys, _split_keys
+
+@pytest.mark.parametrize("data, keys", [
+    (b'j', [b'j']),
+    (b'\x1b', [b'\x1b']),
+    (b'\x1b[B', [b'\x1b[B']),
+    (b'\x1b[B\x1b[B', [b'\x1b[B', b'\x1b[B']),
+    (b'\x1b[Bj', [b'\x1b[B', b'j']),
+    (b'j\x1b[B', [b'j', b'\x1b[B']),
+    (b'\x1bOA\x1b[1;5C', [b'\x1bOA', b'\x1b[1;5C']),
+    (b'k\x1b', [b'k', b'\x1b']),
+    (b'j\x1b[1;', [b'j', b'\x1b[1;']),
+])
+def test_splits_reads_into_keys(data, keys):
+    assert _split_keys(data) == keys
+
+@pytest.mark.parametrize("data, pending, keys", [
+    (b'\x1b', b'[B', [b'\x1b[B']),
+    (b'j\x1b[', b'Bk', [b'j', b'\x1b[B', b'k']),
+    (b'\x1b[1;', b'5A\x1b[B', [b'\x1b[1;5A', b'\x1b[B']),
+    (b'\x1b', b'', [b'\x1b']),
+])
+def test_completes_escape_sequences_split_across_reads(data, pending, keys):
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, pending)
+        assert _read_keys(read_fd, data) == keys
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+import pytest
+from preflight.ai_reviewer import IncrementalIssueExtractor, ReviewIssue, LineRange
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_extracts_issues_split_across_chunks(chunk_size):
+    response = Path(__file__).parent.parent.joinpath("test-response.txt").read_text(encoding="utf-8")
+    expected = json.loads(response[response.find('['):response.rfind(']') + 1])
+
+    extractor = IncrementalIssueExtractor()
+    issues = []
+    for i in range(0, len(response), chunk_size):
+        issues.extend(extractor.feed(response[i:i + chunk_size]))
+
+    assert issues == [ReviewIssue.from_dict(item) for item in expected]
+
+def test_ignores_braces_inside_strings():
+    extractor = IncrementalIssueExtractor()
+    issues = extractor.feed('[{"file": "a.c", "line": {"start": 1, "end": 2}, "severity": "HIGH", '
+                            '"description": "d", "suggestion": "s", "codeSnippet": "if (a) { \\"}\\" }"}, {"file": "b.c"')
+    issues += extractor.feed(', "line": {"start": 3, "end": 3}, "severity": "LOW", "description": "d", "suggestion": "s"}]')
+
+    assert issues == [
+        ReviewIssue("a.c", LineRange(1, 2), "HIGH", "d", "s", 'if (a) { "}" }'),
+        ReviewIssue("b.c", LineRange(3, 3), "LOW", "d", "s"),
+    ]
+
+def test_skips_objects_that_are_not_issues():
+    extractor = IncrementalIssueExtractor()
+
+    assert extractor.feed('[{"unexpected": true}, {"file": ') == []
+    assert extractor.dropped == ['{"unexpected": true}']
+
+def test_handles_escapes_split_across_chunks():
+    text = '{"file": "a\\\\", "line": {"start": 1, "end": 1}, "severity": "HIGH", "description": "\\"}", "suggestion": "s"}'
+    extractor = IncrementalIssueExtractor()
+    issues = []
+    for char in text:
+        issues.extend(extractor.feed(char))
+
+    assert issues == [ReviewIssue("a\\", LineRange(1, 1), "HIGH", '"}', "s")]
+
+def test_normalizes_severity():
+    issue = ReviewIssue.from_dict({"file": "a.c", "line": {"start": 1, "end": 1}, "severity": "high",
+                                   "description": "d", "suggestion": "s"})
+
+    assert issue.severity == "HIGH"
@@ -1,40 +1,13 @@
-import sys
-from unittest.mock import MagicMock
-sys.modules["llama_cpp"] = MagicMock()
-sys.modules["llama_cpp.llama_types"] = MagicMock()
-
+import mmap
+import os
+import re
 from pathlib import Path
+
+import pytest
 from preflight.ai_reviewer import ReviewIssue, LineRange
 from preflight.report_generator import generate_mock_report
 
-def test_report_generation():
-    issues = [
-        ReviewIssue(
-            file="src/main.py",
-            line=LineRange(10, 15),
-            severity="HIGH",
-            description="This is a critical security vulnerability.",
-            suggestion="Use a safer function.",
-            codeSnippet="def malicious_code():\n    eval(user_input)"
-        ),
-        ReviewIssue(
-            file="src/utils.py",
-            line=LineRange(5, 5),
-            severity="MEDIUM",
-            description="This function is deprecated.",
-            suggestion="Use the new API.",
-            codeSnippet=None
-        ),
-        ReviewIssue(
-            file="README.md",
-            line=LineRange(1, 1),
-            severity="LOW",
-            description="Typo in documentation.",
-            suggestion="Fix typo.",
-            codeSnippet="# Preeflight"
-        )
-    ]
-    
+def test_report_generation(sample_issues):
     reports_root = Path("test_reports").absolute()
     project = "preflight-test"
     branch = "feature/test-report"
@@ -44,7 +17,7 @@ def test_report_generation():
     
     generate_mock_report(
         path=output_path,
-        issues=issues,
+        issues=sample_issues,
         commit_hash="abc1234",
         branch=branch,
         project=project,
@@ -53,30 +26,54 @@ def test_report_generation():
     
     print(f"Report generated at: {output_path}")
     
-    if output_path.exists():
-        content = output_path.read_text()
-        assert "src/main.py" in content
-        assert "severity-HIGH" in content
-        assert "This is a critical security vulnerability" in content
-        
-        # Verify Logo
-        img_dir = reports_root / "img"
-        logo_dest = img_dir / "logo.png"
-        
-        if logo_dest.exists():
-            print("Verification successful: Logo copied to img/logo.png")
-            # Expected relative path from project/branch/report.html to img/logo.png:
-            # ../../img/logo.png
-            if '../../img/logo.png' in content:
-                print("Verification successful: HTML contains correct relative logo path.")
+    if os.access(output_path, os.F_OK):
+        # Searched as mapped bytes, the report is never decoded into a string
+        with open(output_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            # All expected snippets are found in a single scan over the report
+            needles = (b"src/main.py", b"severity-HIGH", b"This is a critical security vulnerability")
+            assert set(re.findall(b"|".join(map(re.escape, needles)), content)) == set(needles)
+            assert content.find(b'href="../../../css/report.css"') != -1
+            assert os.access(reports_root / "css" / "report.css", os.F_OK)
+
+            # Verify Logo
+            img_dir = reports_root / "img"
+            logo_dest = img_dir / "logo.png"
+
+            if os.access(logo_dest, os.F_OK):
+                print("Verification successful: Logo copied to img/logo.png")
+                # Expected relative path from project/branch/report.html to img/logo.png:
+                # ../../img/logo.png
+                if content.find(b'../../img/logo.png') != -1:
+                    print("Verification successful: HTML contains correct relative logo path.")
+                else:
+                     print(f"Verification WARNING: HTML might have incorrect image path. Content snippet: {content[:1000].decode(errors='replace')}")
             else:
-                 print(f"Verification WARNING: HTML might have incorrect image path. Content snippet: {content[:1000]}")
-        else:
-            print("Verification WARNING: Logo NOT copied. (This is expected if logo.png is missing in project root)")
+                print("Verification WARNING: Logo NOT copied. (This is expected if logo.png is missing in project root)")
 
         print("Verification successful: File created and contains expected content.")
     else:
         print("Verification failed: File not created.")
 
+def test_report_escapes_html(tmp_path):
+    issue = ReviewIssue(
+        file="src/<app>.py",
+        line=LineRange(1, 1),
+        severity="HIGH",
+        description="<script>alert('x')</script>",
+        suggestion="Use \"&\" carefully.",
+        codeSnippet="if a < b && b > c:"
+    )
+    output_path = tmp_path / "report.html"
+
+    generate_mock_report(output_path, [issue], "abc1234", "feature/<b>", "project", reports_root=tmp_path)
+
+    content = output_path.read_text()
+    assert "<script>" not in content
+    assert "&lt;script&gt;alert(&#x27;x&#x27;)&lt;/script&gt;" in content
+    assert "src/&lt;app&gt;.py" in content
+    assert "Use &quot;&amp;&quot; carefully." in content
+    assert "if a &lt; b &amp;&amp; b &gt; c:" in content
+    assert "feature/&lt;b&gt;" in content
+
 if __name__ == "__main__":
-    test_report_generation()
+    pytest.main([__file__])
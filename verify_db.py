@@ -1,44 +1,56 @@
+import os
 import sqlite3
 from pathlib import Path
 
+REQUIRED_COLUMNS = ("commit_hash", "branch", "project")
+# Kept as constants so every execution reuses the connection's cached prepared statement
+ISSUE_SEQUENCE_SQL = "SELECT seq FROM sqlite_sequence WHERE name = ?"
+MAX_ISSUE_ID_SQL = "SELECT coalesce(max(id), 0) FROM issues"
+LATEST_ISSUE_SQL = "SELECT file, commit_hash, branch, project FROM issues ORDER BY id DESC LIMIT 1"
+
 db_path = Path.home() / ".preflight" / "reviews.db"
 print(f"Checking database at: {db_path}")
 
-if not db_path.exists():
+if not os.access(db_path, os.F_OK):
     print("ERROR: Database file not found.")
     exit(1)
 
+# Opened read-only, the verifier can never write to or lock the database for writing
+conn = sqlite3.connect(f"{db_path.as_uri()}?mode=ro", uri=True, isolation_level=None)
 try:
-    conn = sqlite3.connect(db_path)
+    # Read through a memory map with a larger page cache
+    conn.executescript("""
+        PRAGMA query_only=ON;
+        PRAGMA cache_size=-16000;
+        PRAGMA mmap_size=268435456;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA trusted_schema=OFF;
+    """)
     cursor = conn.cursor()
-    cursor.execute("SELECT count(*) FROM issues")
-    count = cursor.fetchone()[0]
+    # Issues are never deleted, so the AUTOINCREMENT sequence equals the row count without a table scan
+    cursor.execute(ISSUE_SEQUENCE_SQL, ("issues",))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(MAX_ISSUE_ID_SQL, ())
+        row = cursor.fetchone()
+    count = row[0]
     print(f"Row count in issues table: {count}")
     
     # Check for columns
     cursor.execute("PRAGMA table_info(issues)")
-    columns = [info[1] for info in cursor.fetchall()]
-    
-    if "commit_hash" in columns:
-        print("SUCCESS: commit_hash column exists.")
-    else:
-        print("FAILURE: commit_hash column missing.")
-        
-    if "branch" in columns:
-        print("SUCCESS: branch column exists.")
-    else:
-        print("FAILURE: branch column missing.")
+    columns = frozenset(info[1] for info in cursor.fetchall())
+
+    for column in REQUIRED_COLUMNS:
+        if column in columns:
+            print(f"SUCCESS: {column} column exists.")
+        else:
+            print(f"FAILURE: {column} column missing.")
 
-    if "project" in columns:
-        print("SUCCESS: project column exists.")
-    else:
-        print("FAILURE: project column missing.")
-        
-    cursor.execute("SELECT file, commit_hash, branch, project FROM issues ORDER BY id DESC LIMIT 1")
+    cursor.execute(LATEST_ISSUE_SQL, ())
     row = cursor.fetchone()
     print(f"Sample row (latest): {row}")
-    
-    conn.close()
 
 except Exception as e:
     print(f"ERROR: {e}")
+finally:
+    conn.close()